@@ -0,0 +1,140 @@
+"""Cross-backend determinism and throughput benchmark.
+
+Each backend is checked for an exact round trip and for byte-identical output
+across repeated compressions, and timed on compress and decompress. With
+--cross, every backend also tries to decode every other backend's stream,
+which only succeeds when two backends produce bit-identical distributions.
+
+Example:
+    python backend/benchmark.py --onnx Qwen/Qwen3-0.6B --torch Qwen/Qwen3-0.6B \
+        --cpp models/Qwen3-0.6B-Q8_0.gguf
+"""
+
+import argparse
+import os
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+TEXTS = [
+    "hello world",
+    "The quick brown fox jumps over the lazy dog.",
+    "hello 🌍 world",
+    "When in the Course of human events, it becomes necessary for one people to "
+    "dissolve the political bands which have connected them with another, and to "
+    "assume among the powers of the earth, the separate and equal station to which "
+    "the Laws of Nature and of Nature's God entitle them, a decent respect to the "
+    "opinions of mankind requires that they should declare the causes which impel "
+    "them to the separation.",
+]
+
+
+def load_backend(name: str, path: str):
+    if name == "onnx":
+        from lm_compress_onnx import LMCompressOnnx
+
+        return LMCompressOnnx(path)
+    if name == "cpp":
+        from lm_compress_cpp import LMCompressCpp
+
+        return LMCompressCpp(path)
+    from lm_compress import LMCompress
+
+    return LMCompress(path)
+
+
+def count_tokens(lm, text: str) -> tuple[int, str]:
+    """Compress once, counting per-token progress events."""
+    tokens = 0
+    for progress, result in lm.compress_with_progress(text):
+        if result is None and progress > 0:
+            tokens += 1
+    return tokens, result
+
+
+def bench_backend(lm, texts) -> tuple[dict, dict]:
+    stats = {"tokens": 0, "compress_s": 0.0, "decompress_s": 0.0, "in_bytes": 0, "out_bytes": 0}
+    streams = {}
+    failures = []
+    for text in texts:
+        start = time.perf_counter()
+        tokens, compressed = count_tokens(lm, text)
+        stats["compress_s"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        decompressed = lm.decompress(compressed)
+        stats["decompress_s"] += time.perf_counter() - start
+
+        stats["tokens"] += tokens
+        stats["in_bytes"] += len(text.encode("utf-8"))
+        stats["out_bytes"] += len(compressed) * 3 // 4
+        streams[text] = compressed
+
+        if decompressed != text:
+            failures.append(f"round trip mismatch for {text[:30]!r}")
+        if lm.compress(text) != compressed:
+            failures.append(f"non-deterministic stream for {text[:30]!r}")
+    stats["failures"] = failures
+    return stats, streams
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--onnx", help="HF model name or exported ONNX directory")
+    parser.add_argument("--cpp", help="GGUF model path")
+    parser.add_argument("--torch", help="HF model name")
+    parser.add_argument("--cross", action="store_true", help="decode each other's streams")
+    args = parser.parse_args()
+
+    configured = {
+        name: path
+        for name, path in (("onnx", args.onnx), ("cpp", args.cpp), ("torch", args.torch))
+        if path
+    }
+    if not configured:
+        parser.error("configure at least one of --onnx, --cpp, --torch")
+
+    backends = {}
+    all_streams = {}
+    ok = True
+    for name, path in configured.items():
+        print(f"Loading {name} backend from {path}...")
+        lm = load_backend(name, path)
+        backends[name] = lm
+        stats, all_streams[name] = bench_backend(lm, TEXTS)
+        ok = ok and not stats["failures"]
+        print(
+            f"{name:>6}: ratio {stats['out_bytes'] / stats['in_bytes']:.3f}  "
+            f"compress {stats['tokens'] / stats['compress_s']:.1f} tok/s  "
+            f"decompress {stats['tokens'] / stats['decompress_s']:.1f} tok/s"
+        )
+        for failure in stats["failures"]:
+            print(f"        FAIL {failure}")
+
+    if args.cross:
+        for decoder_name, lm in backends.items():
+            # LMCompress has no context bound, so a foreign stream that never
+            # decodes to EOS would not terminate.
+            if decoder_name == "torch":
+                continue
+            for encoder_name, streams in all_streams.items():
+                if decoder_name == encoder_name:
+                    continue
+                matches = 0
+                for text, compressed in streams.items():
+                    try:
+                        matches += lm.decompress(compressed) == text
+                    except Exception:
+                        pass
+                print(
+                    f"{encoder_name} -> {decoder_name}: {matches}/{len(streams)} streams decode"
+                )
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
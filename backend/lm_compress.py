@@ -3,133 +3,7 @@ import base64
 import torch
 import numpy as np
 
-NUM_STATE_BITS = 64
-FREQ_SCALE_FACTOR = 1 << 32
-
-
-class ArithmeticEncoder:
-    """Integer-based arithmetic encoder with streaming bit output."""
-
-    def __init__(self):
-        full_range = 1 << NUM_STATE_BITS
-        self.half_range = full_range >> 1
-        self.quarter_range = self.half_range >> 1
-        self.state_mask = full_range - 1
-        self.low = 0
-        self.high = self.state_mask
-        self.pending_bits = 0
-        self.output = bytearray()
-        self.bit_index = 0
-
-    def encode_symbol(self, cum_freqs: np.ndarray, symbol: int):
-        """Encode a symbol given cumulative frequencies."""
-        total = int(cum_freqs[-1])
-        range_size = self.high - self.low + 1
-
-        sym_high = int(cum_freqs[symbol])
-        sym_low = int(cum_freqs[symbol - 1]) if symbol > 0 else 0
-
-        self.high = self.low + sym_high * range_size // total - 1
-        self.low = self.low + sym_low * range_size // total
-
-        # Normalize: shift out matching top bits
-        while ((self.low ^ self.high) & self.half_range) == 0:
-            self._shift_bit()
-            self.low = (self.low << 1) & self.state_mask
-            self.high = ((self.high << 1) & self.state_mask) | 1
-
-        # Handle underflow (interval straddles midpoint but is narrow)
-        while (self.low & ~self.high & self.quarter_range) != 0:
-            self.pending_bits += 1
-            self.low = (self.low << 1) ^ self.half_range
-            self.high = ((self.high ^ self.half_range) << 1) | self.half_range | 1
-
-    def _shift_bit(self):
-        """Output a bit and any pending underflow bits."""
-        bit = self.low >> (NUM_STATE_BITS - 1)
-        self._write_bit(bit)
-        for _ in range(self.pending_bits):
-            self._write_bit(bit ^ 1)
-        self.pending_bits = 0
-
-    def _write_bit(self, bit: int):
-        """Write a single bit to output."""
-        if self.bit_index == 0:
-            self.output.append(0)
-        self.output[-1] |= bit << (7 - self.bit_index)
-        self.bit_index = (self.bit_index + 1) % 8
-
-    def finish(self) -> bytes:
-        """Finish encoding and return compressed bytes."""
-        self._write_bit(1)
-        return bytes(self.output)
-
-
-class ArithmeticDecoder:
-    """Integer-based arithmetic decoder."""
-
-    def __init__(self, data: bytes):
-        full_range = 1 << NUM_STATE_BITS
-        self.half_range = full_range >> 1
-        self.quarter_range = self.half_range >> 1
-        self.state_mask = full_range - 1
-        self.low = 0
-        self.high = self.state_mask
-
-        self.data = data
-        self.byte_index = 0
-        self.bit_index = 0
-
-        # Initialize code with first NUM_STATE_BITS bits
-        self.code = 0
-        for _ in range(NUM_STATE_BITS):
-            self.code = (self.code << 1) | self._read_bit()
-
-    def _read_bit(self) -> int:
-        """Read a single bit from input."""
-        if self.byte_index >= len(self.data):
-            return 0
-        bit = (self.data[self.byte_index] >> (7 - self.bit_index)) & 1
-        self.bit_index += 1
-        if self.bit_index == 8:
-            self.bit_index = 0
-            self.byte_index += 1
-        return bit
-
-    def decode_symbol(self, cum_freqs: np.ndarray) -> int:
-        """Decode a symbol given cumulative frequencies."""
-        total = int(cum_freqs[-1])
-        range_size = self.high - self.low + 1
-
-        # Find symbol whose interval contains the code
-        offset = self.code - self.low
-        value = ((offset + 1) * total - 1) // range_size
-        symbol = int(np.searchsorted(cum_freqs, value, side="right"))
-
-        # Update interval
-        sym_high = int(cum_freqs[symbol])
-        sym_low = int(cum_freqs[symbol - 1]) if symbol > 0 else 0
-
-        self.high = self.low + sym_high * range_size // total - 1
-        self.low = self.low + sym_low * range_size // total
-
-        # Normalize: shift out matching top bits
-        while ((self.low ^ self.high) & self.half_range) == 0:
-            self.code = ((self.code << 1) & self.state_mask) | self._read_bit()
-            self.low = (self.low << 1) & self.state_mask
-            self.high = ((self.high << 1) & self.state_mask) | 1
-
-        # Handle underflow
-        while (self.low & ~self.high & self.quarter_range) != 0:
-            self.code = (
-                (self.code & self.half_range)
-                | ((self.code << 1) & (self.state_mask >> 1))
-                | self._read_bit()
-            )
-            self.low = (self.low << 1) ^ self.half_range
-            self.high = ((self.high ^ self.half_range) << 1) | self.half_range | 1
-
-        return symbol
+from arithmetic_coder import FREQ_SCALE_FACTOR, ArithmeticDecoder, ArithmeticEncoder
 
 
 class LMCompress:
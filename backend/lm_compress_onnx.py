@@ -0,0 +1,221 @@
+from transformers import AutoConfig, AutoTokenizer
+import base64
+import os
+import shutil
+import tempfile
+import numpy as np
+import onnxruntime as ort
+
+from arithmetic_coder import FREQ_SCALE_FACTOR, ArithmeticDecoder, ArithmeticEncoder
+
+ONNX_FILENAME = "model.onnx"
+
+
+def export_onnx(model_name: str, output_dir: str) -> str:
+    """Export a HF causal LM to ONNX with past_key_values inputs/outputs.
+
+    The export is written to a sibling directory and moved into place only
+    once it has completed, so an interrupted export is never reused.
+    """
+    from optimum.exporters.onnx import main_export
+
+    print(f"Exporting {model_name} to ONNX at {output_dir}...")
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".export-")
+    try:
+        main_export(
+            model_name,
+            output=tmp_dir,
+            task="text-generation-with-past",
+        )
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.replace(tmp_dir, output_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return output_dir
+
+
+class LMCompressOnnx:
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str | None = None,
+        n_ctx: int = 2048,
+        num_threads: int | None = None,
+    ):
+        """Initialize from a HF model name or a directory holding model.onnx.
+
+        Both directions step one token at a time over the KV cache. A batched
+        prefill is not used for compression: ORT CPU kernels give slightly
+        different logits for different sequence lengths, and the decoder must
+        see bit-identical frequencies to the encoder.
+        """
+        if os.path.exists(os.path.join(model_name, ONNX_FILENAME)):
+            onnx_dir = model_name
+        else:
+            onnx_dir = cache_dir or os.path.join(
+                tempfile.gettempdir(), "onnx", model_name.replace("/", "--")
+            )
+            if not os.path.exists(os.path.join(onnx_dir, ONNX_FILENAME)):
+                export_onnx(model_name, onnx_dir)
+            else:
+                print(f"Using cached ONNX export at {onnx_dir}")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        self.vocab_size = AutoConfig.from_pretrained(onnx_dir).vocab_size
+        self.eos_token_id = self.tokenizer.eos_token_id
+        self.bos_token_id = self.tokenizer.bos_token_id
+        self.n_ctx = n_ctx
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if num_threads:
+            # Otherwise ORT sizes the intra-op pool by physical cores
+            options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            os.path.join(onnx_dir, ONNX_FILENAME),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.past_inputs = [
+            i for i in self.session.get_inputs() if i.name.startswith("past_key_values")
+        ]
+        self.output_names = [o.name for o in self.session.get_outputs()]
+
+    def _empty_past(self) -> dict:
+        """Zero-length KV cache for the first forward pass."""
+        past = {}
+        for i in self.past_inputs:
+            # [batch, num_kv_heads, past_seq_len, head_dim]
+            _, num_heads, _, head_dim = i.shape
+            dtype = np.float16 if i.type == "tensor(float16)" else np.float32
+            past[i.name] = np.zeros((1, num_heads, 0, head_dim), dtype=dtype)
+        return past
+
+    def _step(self, token: int, past: dict, past_len: int):
+        """Run one token on top of the cache. Returns (logits, new_past)."""
+        feeds = {"input_ids": np.array([[token]], dtype=np.int64)}
+        if "attention_mask" in self.input_names:
+            feeds["attention_mask"] = np.ones((1, past_len + 1), dtype=np.int64)
+        if "position_ids" in self.input_names:
+            feeds["position_ids"] = np.array([[past_len]], dtype=np.int64)
+        feeds.update(past)
+
+        outputs = self.session.run(self.output_names, feeds)
+        new_past = {}
+        logits = None
+        for name, value in zip(self.output_names, outputs):
+            if name == "logits":
+                logits = value[0, -1]
+            elif name.startswith("present"):
+                new_past[name.replace("present", "past_key_values", 1)] = value
+        return logits, new_past
+
+    def _compute_cdf(self, logits: np.ndarray) -> np.ndarray:
+        """Convert logits to cumulative frequencies."""
+        logits = logits.astype(np.float64)
+        logprobs = logits - np.logaddexp.reduce(logits)
+        probs = np.exp(logprobs)
+        freqs = np.maximum(1, np.round(FREQ_SCALE_FACTOR * probs))
+        return np.cumsum(freqs)
+
+    def _start(self):
+        """Logits for the first token and the cache after BOS.
+
+        Without a BOS token the first symbol is coded under a uniform
+        distribution, matching LMCompress.
+        """
+        past = self._empty_past()
+        if self.bos_token_id is None:
+            return np.zeros(self.vocab_size, dtype=np.float32), past, 0
+        logits, past = self._step(self.bos_token_id, past, 0)
+        return logits, past, 1
+
+    def compress(self, text: str) -> str:
+        for progress, result in self.compress_with_progress(text):
+            pass
+        return result
+
+    def compress_with_progress(self, text: str):
+        """Compress with single-token steps over the KV cache.
+
+        Yields:
+            Tuples of (progress_fraction, result). Result is None until final yield.
+        """
+        tokens = self.tokenizer.encode(text)
+        tokens.append(self.eos_token_id)
+        total = len(tokens)
+        if total + 1 > self.n_ctx:
+            raise ValueError(f"Text is {total} tokens, more than n_ctx={self.n_ctx}")
+
+        encoder = ArithmeticEncoder()
+        logits, past, past_len = self._start()
+
+        yield 0.0, None
+
+        for i, token in enumerate(tokens):
+            encoder.encode_symbol(self._compute_cdf(logits), token)
+            yield (i + 1) / total, None
+            if i + 1 < total:
+                logits, past = self._step(token, past, past_len)
+                past_len += 1
+
+        encoder.finish()
+        yield 1.0, base64.b64encode(encoder.output).decode("utf-8")
+
+    def decompress(self, compressed: str) -> str:
+        for progress, text, is_final in self.decompress_with_progress(compressed):
+            if is_final:
+                return text
+        return ""
+
+    def decompress_with_progress(self, compressed: str):
+        """Decompress with single-token steps over the KV cache.
+
+        Yields:
+            Tuples of (progress, text, is_final).
+            During decoding: text is the newly decoded chunk.
+            Final yield: text is the complete result.
+        """
+        data = base64.b64decode(compressed)
+        decoder = ArithmeticDecoder(data)
+        total_bytes = len(data)
+
+        decoded_tokens = []
+        logits, past, past_len = self._start()
+
+        yield 0.0, "", False
+
+        while past_len < self.n_ctx:
+            token = decoder.decode_symbol(self._compute_cdf(logits))
+            if token == self.eos_token_id:
+                break
+
+            decoded_tokens.append(token)
+            chunk = self.tokenizer.decode([token])
+            progress = (
+                min(decoder.byte_index / total_bytes, 0.99) if total_bytes > 0 else 0.5
+            )
+            yield progress, chunk, False
+
+            logits, past = self._step(token, past, past_len)
+            past_len += 1
+
+        yield 1.0, self.tokenizer.decode(decoded_tokens), True
+
+
+if __name__ == "__main__":
+    lm = LMCompressOnnx("Qwen/Qwen3-0.6B")
+    original = "The quick brown fox jumps over the lazy dog."
+    print(f"Original: {original}")
+    compressed = lm.compress(original)
+    print(f"Compressed: {compressed} ({len(compressed)} chars)")
+    decompressed = lm.decompress(compressed)
+    print(f"Decompressed: {decompressed}")
+    print(f"Match: {original == decompressed}")
@@ -0,0 +1,513 @@
+"""Offline load test for the compression service.
+
+Boots ``backend.main:app`` under uvicorn in a separate process with a
+deterministic stand-in for ``LMCompressCpp`` and drives it with an asyncio
+client, so concurrency, pooling and cancellation changes can be measured
+without a GGUF model or a GCS bucket.
+
+Any object with the ``LMCompressCpp`` interface can be served instead of the
+fake with ``--model-factory module:callable``; it is called as
+``factory(model_path, **model_kwargs)``.
+
+Example:
+    python backend/load_test.py --concurrency 8 --requests 200 \
+        --mix 64:0.6,512:0.3,1536:0.1 --token-latency 0.002 --cancel-rate 0.1
+"""
+
+import argparse
+import asyncio
+import base64
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import socket
+import string
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+import httpx
+import numpy as np
+import uvicorn
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from arithmetic_coder import FREQ_SCALE_FACTOR, ArithmeticDecoder, ArithmeticEncoder
+
+ALPHABET = string.ascii_letters + string.digits + " .,;:'!?\n"
+
+
+class FakeLMCompressCpp:
+    """Deterministic stand-in for ``LMCompressCpp``.
+
+    Tokens are UTF-8 bytes plus an EOS id. Next-token logits come from a fixed
+    random table indexed by the previous token, so output is reproducible and
+    round-trips through the real arithmetic coder and stream format.
+
+    ``model_lock`` picks how concurrent requests share the instance:
+
+    - "shared" (the default) is what ``main.py`` does today with the single
+      ``Llama``: every request resets one context held on the instance and no
+      lock is taken, so interleaved requests corrupt each other's streams
+      (``--verify`` reports them as errors).
+    - "request" is a hypothetical per-request lock that ``main.py`` does not
+      have: one compress/decompress at a time owns the instance. A request
+      that stops being iterated for ``abandon_timeout`` seconds, e.g. after a
+      client disconnect, loses ownership to the next one.
+    - "step" is a hypothetical lock around each model step only.
+    - "none" gives every request its own context, like an ideal pool.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        n_ctx: int = 2048,
+        n_gpu_layers: int = -1,
+        token_latency: float = 0.0,
+        seed: int = 0,
+        model_lock: str = "shared",
+        abandon_timeout: float = 1.0,
+    ):
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.token_latency = token_latency
+        self.model_lock = model_lock
+        self.abandon_timeout = abandon_timeout
+        self.lock = threading.Lock()
+        self.owner_changed = threading.Condition()
+        self.owner = None
+        self.owner_active = 0.0
+        self.last_token = None
+        self.eos_token_id = 256
+        self.bos_token_id = 257
+        vocab_size = 258
+
+        rng = np.random.default_rng(seed)
+        # Skew mass towards printable text so compression actually happens
+        bias = np.full(vocab_size, -4.0)
+        bias[[ord(c) for c in ALPHABET]] = 2.0
+        bias[self.eos_token_id] = 0.0
+        self.logits_table = rng.standard_normal((vocab_size, vocab_size)) + bias
+
+    def _compute_cdf(self, logits) -> np.ndarray:
+        """Convert logits to cumulative frequencies."""
+        logprobs = logits - np.logaddexp.reduce(logits)
+        probs = np.exp(logprobs).astype(np.float64)
+        freqs = np.maximum(1, np.round(FREQ_SCALE_FACTOR * probs))
+        return np.cumsum(freqs)
+
+    def _next_logits(self, prev_token: int) -> np.ndarray:
+        if self.model_lock == "shared":
+            # The real context lives on the instance, so an interleaved
+            # request sees whatever token another request fed last
+            prev_token = self.last_token
+        if self.model_lock == "step":
+            with self.lock:
+                return self._eval(prev_token)
+        return self._eval(prev_token)
+
+    def _eval(self, prev_token: int) -> np.ndarray:
+        if self.token_latency:
+            time.sleep(self.token_latency)
+        return self.logits_table[prev_token]
+
+    def _exclusive(self, generator):
+        """Own the instance for the whole request in "request" mode."""
+        if self.model_lock != "request":
+            yield from generator
+            return
+        ticket = object()
+        self._acquire(ticket)
+        try:
+            for item in generator:
+                self._touch(ticket)
+                yield item
+                self._touch(ticket)
+        finally:
+            self._release(ticket)
+
+    def _acquire(self, ticket):
+        with self.owner_changed:
+            while self.owner is not None:
+                idle = time.monotonic() - self.owner_active
+                if idle >= self.abandon_timeout:
+                    print(f"Reclaiming model from a request idle for {idle:.1f}s")
+                    break
+                self.owner_changed.wait(self.abandon_timeout - idle)
+            self.owner = ticket
+            self.owner_active = time.monotonic()
+
+    def _touch(self, ticket):
+        with self.owner_changed:
+            if self.owner is not ticket:
+                raise RuntimeError("model was reset by another request")
+            self.owner_active = time.monotonic()
+
+    def _release(self, ticket):
+        with self.owner_changed:
+            if self.owner is ticket:
+                self.owner = None
+                self.owner_changed.notify_all()
+
+    def compress(self, text: str) -> str:
+        for progress, result in self.compress_with_progress(text):
+            pass
+        return result
+
+    def compress_with_progress(self, text: str):
+        tokens = list(text.encode("utf-8"))
+        if len(tokens) + 2 > self.n_ctx:
+            raise ValueError(f"Text is {len(tokens)} bytes, more than n_ctx={self.n_ctx}")
+        return self._exclusive(self._compress(tokens))
+
+    def _compress(self, tokens: list[int]):
+        tokens.append(self.eos_token_id)
+        total = len(tokens)
+
+        encoder = ArithmeticEncoder()
+        prev_token = self.last_token = self.bos_token_id
+
+        yield 0.0, None
+
+        for i, token in enumerate(tokens):
+            cdf = self._compute_cdf(self._next_logits(prev_token))
+            encoder.encode_symbol(cdf, token)
+            prev_token = self.last_token = token
+            yield (i + 1) / total, None
+
+        encoder.finish()
+        yield 1.0, base64.b64encode(encoder.output).decode("utf-8")
+
+    def decompress(self, compressed: str) -> str:
+        for progress, text, is_final in self.decompress_with_progress(compressed):
+            if is_final:
+                return text
+        return ""
+
+    def decompress_with_progress(self, compressed: str):
+        return self._exclusive(self._decompress(compressed))
+
+    def _decompress(self, compressed: str):
+        data = base64.b64decode(compressed)
+        decoder = ArithmeticDecoder(data)
+        total_bytes = len(data)
+
+        decoded_tokens = []
+        prev_token = self.last_token = self.bos_token_id
+
+        yield 0.0, "", False
+
+        while len(decoded_tokens) < self.n_ctx - 1:
+            cdf = self._compute_cdf(self._next_logits(prev_token))
+            token = decoder.decode_symbol(cdf)
+            if token == self.eos_token_id:
+                break
+            decoded_tokens.append(token)
+            prev_token = self.last_token = token
+            chunk = bytes([token]).decode("utf-8", errors="replace")
+            progress = (
+                min(decoder.byte_index / total_bytes, 0.99) if total_bytes > 0 else 0.5
+            )
+            yield progress, chunk, False
+
+        yield 1.0, bytes(decoded_tokens).decode("utf-8"), True
+
+
+@dataclass
+class RequestResult:
+    ok: bool
+    ttfe: float
+    latency: float
+    tokens: int
+    error: str = ""
+    cancelled: bool = False
+    result: str | None = None
+
+
+def parse_mix(spec: str) -> list[tuple[int, float]]:
+    """Parse a ``size:weight,size:weight`` payload mix."""
+    mix = []
+    for part in spec.split(","):
+        size, _, weight = part.partition(":")
+        mix.append((int(size), float(weight or 1)))
+    return mix
+
+
+def make_payloads(mix, count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    sizes = rng.choices([s for s, _ in mix], weights=[w for _, w in mix], k=count)
+    return ["".join(rng.choices(ALPHABET, k=size)) for size in sizes]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+DEFAULT_MODEL_FACTORY = "load_test:FakeLMCompressCpp"
+
+
+def load_factory(path: str):
+    """Resolve a ``module:callable`` model factory."""
+    module_name, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def serve(port: int, factory_path: str, model_kwargs: dict):
+    """Run backend.main:app in this process with the given model factory."""
+    # A local directory stands in for the GCS bucket; get_model_path passes
+    # non-gs:// paths through untouched.
+    os.environ["MODEL_PATH"] = tempfile.mkdtemp(prefix="fake-model-")
+    os.environ["MODEL_BACKEND"] = "cpp"
+
+    import main as service
+
+    factory = load_factory(factory_path)
+    service.LMCompressCpp = lambda model_path: factory(model_path, **model_kwargs)
+    uvicorn.run(service.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(port: int, factory_path: str, model_kwargs: dict, timeout: float = 30.0):
+    """Boot the service in a separate process so it does not share the GIL
+    with the load-generating client.
+
+    One untimed request loads the model before returning, since
+    main.get_lm_compress would otherwise build a model per concurrent request
+    in the first wave.
+    """
+    process = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(port, factory_path, model_kwargs), daemon=True
+    )
+    process.start()
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while True:
+        if not process.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        try:
+            if httpx.get(f"{base_url}/health").status_code == 200:
+                break
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            process.terminate()
+            raise RuntimeError("uvicorn did not become healthy in time")
+        time.sleep(0.05)
+    httpx.post(f"{base_url}/compress", json="warm-up", timeout=timeout).raise_for_status()
+    return process
+
+
+async def run_request(
+    client: httpx.AsyncClient, endpoint: str, payload: str, cancel_after: int | None
+):
+    """Stream one request. With ``cancel_after``, disconnect after that many events."""
+    start = time.perf_counter()
+    ttfe = None
+    events = 0
+    tokens = 0
+    result = None
+    try:
+        async with client.stream("POST", f"/{endpoint}", json=payload) as response:
+            if response.status_code != 200:
+                return RequestResult(
+                    False, 0.0, time.perf_counter() - start, 0, f"HTTP {response.status_code}"
+                )
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                if ttfe is None:
+                    ttfe = time.perf_counter() - start
+                event = json.loads(line[6:])
+                events += 1
+                if "result" in event:
+                    result = event["result"]
+                elif event.get("progress") or "chunk" in event:
+                    tokens += 1
+                if cancel_after is not None and events >= cancel_after and result is None:
+                    # Leaving the stream context closes the connection early
+                    return RequestResult(
+                        False, ttfe, time.perf_counter() - start, tokens, cancelled=True
+                    )
+    except Exception as e:
+        return RequestResult(False, 0.0, time.perf_counter() - start, 0, repr(e))
+    latency = time.perf_counter() - start
+    if result is None:
+        return RequestResult(False, ttfe or 0.0, latency, tokens, "stream ended without result")
+    return RequestResult(True, ttfe, latency, tokens, result=result)
+
+
+async def run_load(
+    client: httpx.AsyncClient, endpoint: str, payloads, cancels, concurrency: int
+):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(payload, cancel_after):
+        async with semaphore:
+            return await run_request(client, endpoint, payload, cancel_after)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(bounded(p, c) for p, c in zip(payloads, cancels)))
+    return results, time.perf_counter() - start
+
+
+async def run_load_http(
+    base_url: str, endpoint: str, payloads, cancels, concurrency: int, timeout: float
+):
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        return await run_load(client, endpoint, payloads, cancels, concurrency)
+
+
+def verify(results, texts, endpoint: str, reference) -> None:
+    """Mark completed requests that do not reproduce their source text as errors."""
+    for r, text in zip(results, texts):
+        if not r.ok:
+            continue
+        try:
+            decoded = reference.decompress(r.result) if endpoint == "compress" else r.result
+        except UnicodeDecodeError:
+            decoded = None
+        if decoded != text:
+            r.ok = False
+            r.error = "result mismatch"
+
+
+def summarize(results, wall_time: float) -> dict:
+    ok = [r for r in results if r.ok]
+    cancelled = [r for r in results if r.cancelled]
+    errors = len(results) - len(ok) - len(cancelled)
+    summary = {
+        "requests": len(results),
+        "cancelled": len(cancelled),
+        "errors": errors,
+        "error_rate": errors / len(results) if results else 0.0,
+        "wall_time_s": wall_time,
+        "tokens_per_s": sum(r.tokens for r in ok) / wall_time if wall_time else 0.0,
+    }
+    for name in ("ttfe", "latency"):
+        values = np.array([getattr(r, name) for r in ok])
+        for q in (50, 95, 99):
+            summary[f"{name}_p{q}_ms"] = (
+                float(np.percentile(values, q)) * 1000 if len(values) else None
+            )
+    values = np.array([r.latency for r in cancelled])
+    summary["cancel_p50_ms"] = float(np.percentile(values, 50)) * 1000 if len(values) else None
+    samples = sorted({r.error for r in results if not r.ok and not r.cancelled})
+    if samples:
+        summary["error_samples"] = samples[:5]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument(
+        "--mix", default="64:0.6,512:0.3,1536:0.1", help="size:weight pairs in characters"
+    )
+    parser.add_argument(
+        "--endpoint", choices=["compress", "decompress"], default="compress"
+    )
+    parser.add_argument(
+        "--token-latency", type=float, default=0.0, help="seconds per fake model step"
+    )
+    parser.add_argument(
+        "--model-factory",
+        default=DEFAULT_MODEL_FACTORY,
+        help="module:callable building the served model; fake options below "
+        "only apply to the default",
+    )
+    parser.add_argument(
+        "--model-lock",
+        choices=["shared", "request", "step", "none"],
+        default="shared",
+        help="shared: unlocked single context like main.py today; request/step: "
+        "hypothetical locks; none: independent contexts (see FakeLMCompressCpp)",
+    )
+    parser.add_argument(
+        "--abandon-timeout",
+        type=float,
+        default=1.0,
+        help="with --model-lock request, idle seconds before another request takes over",
+    )
+    parser.add_argument("--n-ctx", type=int, default=2048)
+    parser.add_argument(
+        "--cancel-rate", type=float, default=0.0, help="fraction of requests to abort early"
+    )
+    parser.add_argument(
+        "--cancel-after", type=int, default=5, help="events to read before aborting"
+    )
+    parser.add_argument(
+        "--verify", action="store_true", help="check every result reproduces its text"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    too_long = [size for size, _ in mix if size > args.n_ctx - 2]
+    if too_long:
+        parser.error(f"--mix sizes {too_long} exceed --n-ctx {args.n_ctx} minus BOS/EOS")
+
+    model_kwargs = {}
+    if args.model_factory == DEFAULT_MODEL_FACTORY:
+        model_kwargs = {
+            "n_ctx": args.n_ctx,
+            "token_latency": args.token_latency,
+            "seed": args.seed,
+            "model_lock": args.model_lock,
+            "abandon_timeout": args.abandon_timeout,
+        }
+    # Only used single-threaded, to build decompress payloads and for --verify
+    reference = load_factory(args.model_factory)(tempfile.mkdtemp(), **model_kwargs)
+    texts = make_payloads(mix, args.requests, args.seed)
+    payloads = texts
+    if args.endpoint == "decompress":
+        payloads = [reference.compress(t) for t in texts]
+    rng = random.Random(args.seed + 1)
+    cancels = [
+        args.cancel_after if rng.random() < args.cancel_rate else None for _ in payloads
+    ]
+
+    port = free_port()
+    server = start_server(port, args.model_factory, model_kwargs)
+    try:
+        results, wall_time = asyncio.run(
+            run_load_http(
+                f"http://127.0.0.1:{port}",
+                args.endpoint,
+                payloads,
+                cancels,
+                args.concurrency,
+                args.timeout,
+            )
+        )
+    finally:
+        server.terminate()
+        server.join(5)
+        if server.is_alive():
+            server.kill()
+
+    if args.verify:
+        verify(results, texts, args.endpoint, reference)
+
+    summary = summarize(results, wall_time)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for key, value in summary.items():
+            if isinstance(value, float):
+                value = f"{value:.2f}"
+            print(f"{key:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import json
 import os
+import shutil
 import sys
 import tempfile
 from contextlib import asynccontextmanager
@@ -15,6 +16,7 @@ if backend_dir not in sys.path:
 try:
     from lm_compress import LMCompress
     from lm_compress_cpp import LMCompressCpp
+    from lm_compress_onnx import ONNX_FILENAME, LMCompressOnnx
 except ImportError as e:
     print(f"ERROR: Failed to import modules: {e}")
     print(f"Python path: {sys.path}")
@@ -30,9 +32,47 @@ try:
 except ImportError:
     pass  # python-dotenv not installed, that's okay for Cloud Run
 
+def download_gcs_dir(bucket, prefix: str) -> str:
+    """Download every blob under a GCS prefix, e.g. an ONNX export directory."""
+    prefix = prefix.rstrip("/")
+    local_dir = os.path.join(tempfile.gettempdir(), os.path.basename(prefix))
+    if os.path.exists(os.path.join(local_dir, ONNX_FILENAME)):
+        print(f"Using cached model at {local_dir}")
+        return local_dir
+
+    # Download next to the target and move it into place once complete, so an
+    # interrupted download is never mistaken for a cached model
+    tmp_dir = tempfile.mkdtemp(dir=tempfile.gettempdir(), prefix=".download-")
+    try:
+        for blob in bucket.list_blobs(prefix=prefix + "/"):
+            relative = blob.name[len(prefix) + 1 :]
+            if not relative or relative.endswith("/"):
+                continue
+            local_path = os.path.join(tmp_dir, relative)
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            print(f"Downloading gs://{bucket.name}/{blob.name}...")
+            blob.download_to_filename(local_path)
+        if not os.path.exists(os.path.join(tmp_dir, ONNX_FILENAME)):
+            raise ValueError(
+                f"No {ONNX_FILENAME} under gs://{bucket.name}/{prefix}/. "
+                "MODEL_PATH must point at an exported ONNX directory."
+            )
+        if os.path.exists(local_dir):
+            shutil.rmtree(local_dir)
+        os.replace(tmp_dir, local_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(f"Model downloaded successfully")
+    return local_dir
+
+
 #
-def get_model_path(raw_path=None):
-    """Get model path, downloading from GCS if needed."""
+def get_model_path(raw_path=None, model_backend="cpp"):
+    """Get model path, downloading from GCS if needed.
+
+    For the onnx backend a gs:// path names a directory prefix holding the
+    exported model, its external data and the tokenizer files.
+    """
     # Use provided raw_path or get from app state or env
     if raw_path is None:
         if hasattr(app, 'state') and hasattr(app.state, 'raw_model_path'):
@@ -60,6 +100,8 @@ def get_model_path(raw_path=None):
         # Download to a temporary file
         storage_client = storage.Client()
         bucket = storage_client.bucket(bucket_name)
+        if model_backend == "onnx":
+            return download_gcs_dir(bucket, blob_name)
         blob = bucket.blob(blob_name)
         
         # Use a persistent temp file in /tmp (Cloud Run has writable /tmp)
@@ -87,6 +129,8 @@ async def lifespan(app: FastAPI):
     try:
         raw_model_path = os.getenv("MODEL_PATH")
         app.state.raw_model_path = raw_model_path
+        # "cpp" expects a GGUF file, "onnx" a HF model name or exported directory
+        app.state.model_backend = os.getenv("MODEL_BACKEND", "cpp")
         app.state.lm_compress = None  # Will be loaded on first request
         if raw_model_path:
             print(f"Model path configured (will download/load on first request): {raw_model_path}")
@@ -95,6 +139,7 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"Error in lifespan startup: {e}")
         app.state.raw_model_path = None
+        app.state.model_backend = "cpp"
         app.state.lm_compress = None
     yield
 
@@ -112,9 +157,17 @@ def get_lm_compress():
             raise ValueError("MODEL_PATH environment variable is not set")
         # Get the actual model path (downloads from GCS if needed)
         print(f"Getting model path from: {app.state.raw_model_path}")
-        model_path = get_model_path(app.state.raw_model_path)
-        print(f"Loading model from {model_path}...")
-        app.state.lm_compress = LMCompressCpp(model_path)
+        model_path = get_model_path(app.state.raw_model_path, app.state.model_backend)
+        print(f"Loading {app.state.model_backend} model from {model_path}...")
+        if app.state.model_backend == "onnx":
+            num_threads = os.getenv("ONNX_NUM_THREADS")
+            app.state.lm_compress = LMCompressOnnx(
+                model_path, num_threads=int(num_threads) if num_threads else None
+            )
+        elif app.state.model_backend == "cpp":
+            app.state.lm_compress = LMCompressCpp(model_path)
+        else:
+            raise ValueError(f"Unknown MODEL_BACKEND: {app.state.model_backend}")
         print("Model loaded successfully")
     return app.state.lm_compress
 
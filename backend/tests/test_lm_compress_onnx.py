@@ -0,0 +1,16 @@
+from lm_compress_onnx import LMCompressOnnx
+
+
+def test_roundtrip():
+    lm = LMCompressOnnx("Qwen/Qwen3-0.6B")
+    assert lm.decompress(lm.compress("hello world")) == "hello world"
+
+
+def test_compression_does_something():
+    lm = LMCompressOnnx("Qwen/Qwen3-0.6B")
+    assert len(lm.compress("hello world")) < len("hello world")
+
+
+def test_weird_characters():
+    lm = LMCompressOnnx("Qwen/Qwen3-0.6B")
+    assert lm.decompress(lm.compress("hello 🌍 world")) == "hello 🌍 world"
@@ -0,0 +1,110 @@
+import asyncio
+import tempfile
+
+import httpx
+
+import main
+from load_test import (
+    FakeLMCompressCpp,
+    RequestResult,
+    make_payloads,
+    parse_mix,
+    run_load,
+    summarize,
+    verify,
+)
+
+
+def test_fake_model_roundtrip():
+    lm = FakeLMCompressCpp("")
+    text = "hello 🌍 world"
+    assert lm.decompress(lm.compress(text)) == text
+
+
+def test_fake_model_is_deterministic():
+    assert FakeLMCompressCpp("").compress("hello") == FakeLMCompressCpp("").compress("hello")
+
+
+def test_payload_mix():
+    payloads = make_payloads(parse_mix("8:1,32:0"), 5, seed=0)
+    assert [len(p) for p in payloads] == [8] * 5
+
+
+def test_fake_model_rejects_text_longer_than_context():
+    lm = FakeLMCompressCpp("", n_ctx=8)
+    try:
+        lm.compress("x" * 7)
+    except ValueError:
+        pass
+    else:
+        assert False, "expected ValueError"
+
+
+def test_fake_model_reclaims_abandoned_request():
+    lm = FakeLMCompressCpp("", model_lock="request", abandon_timeout=0.05)
+    abandoned = lm.compress_with_progress("hello")
+    next(abandoned)
+    assert lm.decompress(lm.compress("world")) == "world"
+    try:
+        next(abandoned)
+    except RuntimeError:
+        pass
+    else:
+        assert False, "expected RuntimeError"
+
+
+def test_fake_model_shared_context_corrupts_interleaved_requests():
+    lm = FakeLMCompressCpp("")
+    first = lm.compress_with_progress("hello world")
+    second = lm.compress_with_progress("goodbye moon")
+    results = {}
+    for name, gen in (("first", first), ("second", second)) * 20:
+        for progress, result in [next(gen, (1.0, None))]:
+            if result is not None:
+                results[name] = result
+    verified = [RequestResult(True, 0.0, 0.0, 0, result=results["first"])]
+    verify(verified, ["hello world"], "compress", FakeLMCompressCpp(""))
+    assert verified[0].error == "result mismatch"
+
+
+def test_summarize_excludes_cancelled_from_errors():
+    results = [
+        RequestResult(True, 0.01, 0.1, 10),
+        RequestResult(True, 0.03, 0.3, 30),
+        RequestResult(False, 0.0, 0.2, 0, error="HTTP 500"),
+        RequestResult(False, 0.02, 0.05, 2, cancelled=True),
+    ]
+    summary = summarize(results, wall_time=2.0)
+    assert summary["requests"] == 4
+    assert summary["cancelled"] == 1
+    assert summary["errors"] == 1
+    assert summary["error_rate"] == 0.25
+    assert summary["tokens_per_s"] == 20.0
+    assert summary["ttfe_p50_ms"] == 20.0
+    assert summary["latency_p50_ms"] == 200.0
+    assert summary["cancel_p50_ms"] == 50.0
+    assert summary["error_samples"] == ["HTTP 500"]
+
+
+def test_run_load_against_app():
+    main.app.state.raw_model_path = tempfile.mkdtemp()
+    main.app.state.model_backend = "cpp"
+    main.app.state.lm_compress = FakeLMCompressCpp("", model_lock="none")
+    texts = ["hello world", "abc", "the quick brown fox"]
+    cancels = [None, None, 3]
+
+    async def go():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await run_load(client, "compress", texts, cancels, concurrency=2)
+
+    try:
+        results, _ = asyncio.run(go())
+    finally:
+        main.app.state.lm_compress = None
+    verify(results, texts, "compress", FakeLMCompressCpp(""))
+
+    assert [r.ok for r in results] == [True, True, False]
+    assert results[2].cancelled
+    assert results[0].tokens == len("hello world") + 1
+    assert all(r.ttfe <= r.latency for r in results)